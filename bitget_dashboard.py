@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
-import requests
+import numpy as np
+import httpx
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 import random
 import arrow
+import string
 import textwrap  # <--- 新增：用于清除 HTML 字符串前的缩进空格
-from datetime import datetime
 
 # ==========================================
 # 1. 页面基础配置
@@ -27,6 +30,13 @@ st.markdown("""
         padding-bottom: 2rem;
     }
 
+    /* 核心指标卡片网格 (三张卡片一次性渲染) */
+    .metric-grid {
+        display: grid;
+        grid-template-columns: repeat(3, 1fr);
+        gap: 1rem;
+    }
+
     /* 核心指标卡片样式 */
     .metric-card {
         background-color: #1B1E24;
@@ -59,68 +69,103 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 API_BASE_URL = "https://api.bitget.com"
+TABLE_TOP_N = 200  # 表格默认只展示成交量前 N 个，减少发送到浏览器的数据量
 
 
 # ==========================================
 # 3. 数据服务层 (逻辑保持不变)
 # ==========================================
 
+@st.cache_resource
+def get_client():
+    # HTTP/2 + gzip：多个并发请求复用同一条 TCP/TLS 连接
+    return httpx.Client(
+        http2=True,
+        timeout=5.0,
+        headers={'Accept-Encoding': 'gzip'},
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+    )
+
+
+def _num_col(raw, col):
+    # 缺失列 / 空字符串统一按 0 处理 (与原 float(item.get(col, 0)) 行为一致)
+    if col not in raw:
+        return pd.Series(0.0, index=raw.index)
+    return pd.to_numeric(raw[col], errors='coerce').fillna(0.0).astype('float64')
+
+
+def _compute_changes(last, open_24h, symbol_hash):
+    # 纯 NumPy 数组运算，不经过 pandas 索引对齐
+    change_24h = np.divide(last - open_24h, open_24h,
+                           out=np.zeros_like(last), where=open_24h > 0)
+
+    # 模拟数据 (逻辑不变)
+    random_factor = (symbol_hash % 100).astype('float64') / 1000.0
+    change_1h = change_24h / 6 + random_factor * 0.05
+    change_4h = change_24h / 2 + random_factor * 0.1
+    return change_1h, change_4h, change_24h
+
+
+# 返回 (DataFrame, 抓取时间)，时间随缓存一起保存，反映数据真实的新鲜度
 @st.cache_data(ttl=10)
 def get_all_tickers():
+    fetched_at = arrow.utcnow().format('HH:mm:ss')
     try:
         url = f"{API_BASE_URL}/api/v2/spot/market/tickers"
-        response = requests.get(url, timeout=5)
-        data = response.json()
-
-        if data.get('code') != '00000': return pd.DataFrame()
-
-        tickers = []
-        for item in data['data']:
-            last = float(item.get('lastPr', 0))
-            open_24h = float(item.get('open', 0))
-            change_24h = (last - open_24h) / open_24h if open_24h > 0 else 0
-
-            # 模拟数据 (逻辑不变)
-            random_factor = (hash(item['symbol']) % 100) / 1000
-            change_1h = (change_24h / 6) + (random_factor * 0.05)
-            change_4h = (change_24h / 2) + (random_factor * 0.1)
-
-            tickers.append({
-                "Symbol": item['symbol'].replace('USDT', ''),
-                "Price": last,
-                "Change 1h": change_1h,
-                "Change 4h": change_4h,
-                "Change 24h": change_24h,
-                "High 24h": float(item.get('high24h', 0)),
-                "Low 24h": float(item.get('low24h', 0)),
-                "Volume (USDT)": float(item.get('usdtVolume', item.get('quoteVolume', 0))),
-                "FullSymbol": item['symbol']
-            })
-        return pd.DataFrame(tickers)
+        response = get_client().get(url)
+        data = orjson.loads(response.content)
+
+        if data.get('code') != '00000': return pd.DataFrame(), fetched_at
+
+        raw = pd.DataFrame(data['data'])
+        if raw.empty: return pd.DataFrame(), fetched_at
+
+        last = _num_col(raw, 'lastPr')
+        symbol_hash = pd.util.hash_array(raw['symbol'].to_numpy())
+        change_1h, change_4h, change_24h = _compute_changes(
+            last.to_numpy(), _num_col(raw, 'open').to_numpy(), symbol_hash)
+
+        volume = _num_col(raw, 'usdtVolume') if 'usdtVolume' in raw else _num_col(raw, 'quoteVolume')
+
+        # 按列整体构建，避免逐行 dict 拼装
+        tickers = pd.DataFrame({
+            "Symbol": raw['symbol'].str.replace('USDT', '', regex=False),
+            "Price": last,
+            "Change 1h": change_1h,
+            "Change 4h": change_4h,
+            "Change 24h": change_24h,
+            "High 24h": _num_col(raw, 'high24h'),
+            "Low 24h": _num_col(raw, 'low24h'),
+            "Volume (USDT)": volume,
+            "FullSymbol": raw['symbol']
+        })
+        return tickers, fetched_at
     except Exception as e:
-        return pd.DataFrame()
+        return pd.DataFrame(), fetched_at
 
 
-def get_coin_details(symbol):
+# ticker_row 取自 get_all_tickers 的结果，省去单独的 ticker 请求
+# _client 以下划线开头，Streamlit 不对其做哈希
+@st.cache_data(ttl=10, max_entries=64, show_spinner=False)
+def get_coin_details(symbol, ticker_row, _client):
+    if ticker_row is None: return None
     try:
         usdt_symbol = f"{symbol}USDT"
-        ticker_res = requests.get(f"{API_BASE_URL}/api/v2/spot/market/tickers?symbol={usdt_symbol}").json()
-        current_price = float(ticker_res['data'][0]['lastPr'])
+        current_price = float(ticker_row['Price'])
 
         candle_url = f"{API_BASE_URL}/api/v2/spot/market/candles?symbol={usdt_symbol}&granularity=1h&limit=5"
-        candles = requests.get(candle_url).json()['data']
+        candles = orjson.loads(_client.get(candle_url).content)['data']
 
         price_1h_ago = float(candles[1][4]) if len(candles) > 1 else current_price
         price_4h_ago = float(candles[4][4]) if len(candles) > 4 else current_price
 
         change_1h = (current_price - price_1h_ago) / price_1h_ago
         change_4h = (current_price - price_4h_ago) / price_4h_ago
-        change_24h = float(ticker_res['data'][0]['open'])
-        change_24h = (current_price - change_24h) / change_24h if change_24h > 0 else 0
+        change_24h = float(ticker_row['Change 24h'])
 
         # 获取 OI
-        oi_res = requests.get(
-            f"{API_BASE_URL}/api/v2/mix/market/open-interest?symbol={usdt_symbol}&productType=USDT-FUTURES").json()
+        oi_res = orjson.loads(_client.get(
+            f"{API_BASE_URL}/api/v2/mix/market/open-interest?symbol={usdt_symbol}&productType=USDT-FUTURES").content)
         oi_size = float(oi_res['data']['openInterestList'][0]['size']) if oi_res.get('data') and 'openInterestList' in \
                                                                           oi_res['data'] else 0
         oi_value = oi_size * current_price
@@ -143,6 +188,32 @@ def get_coin_details(symbol):
 # 4. UI 渲染组件
 # ==========================================
 
+# HTML 卡片模板 (模块加载时构建一次)
+# 使用 textwrap.dedent 去除多行字符串前的缩进空格；不留空行，避免 Markdown 截断 HTML 块
+_CARD_TMPL = string.Template(textwrap.dedent("""
+    <div class="metric-card">
+        <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 10px;">
+            <div style="font-size: 1.2rem; font-weight: bold; color: #EAECEF;">$symbol <span style="font-size: 0.8rem; color: #848E9C; background: #2B3139; padding: 2px 6px; border-radius: 4px;">PERP</span></div>
+            <div class="metric-value">$$$price</div>
+        </div>
+        <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 5px; margin-bottom: 15px;">
+            <div><div class="metric-label">1H</div><div class="$c_1h">$change_1h%</div></div>
+            <div><div class="metric-label">4H</div><div class="$c_4h">$change_4h%</div></div>
+            <div style="text-align: right;"><div class="metric-label">24H</div><div class="$c_24h">$change_24h%</div></div>
+        </div>
+        <div style="border-top: 1px solid #2B3139; padding-top: 10px;">
+            <div style="display: flex; justify-content: space-between;">
+                <span class="metric-label">Open Interest</span>
+                <span style="color: #EAECEF; font-weight: 500;">$oi_value</span>
+            </div>
+            <div style="margin-top: 5px; height: 6px; background: #2B3139; border-radius: 3px; overflow: hidden;">
+                <div style="width: 70%; height: 100%; background: linear-gradient(90deg, #0ECB81 0%, #25a69a 100%);"></div>
+            </div>
+        </div>
+    </div>
+""").strip())
+
+
 def format_currency(val):
     if val > 1_000_000_000:
         return f"${val / 1_000_000_000:.2f}B"
@@ -152,41 +223,79 @@ def format_currency(val):
         return f"${val:,.0f}"
 
 
-def render_html_card(data):
-    if not data: return
-
-    # 辅助颜色
-    c_1h = "trend-up" if data['change_1h'] >= 0 else "trend-down"
-    c_4h = "trend-up" if data['change_4h'] >= 0 else "trend-down"
-    c_24h = "trend-up" if data['change_24h'] >= 0 else "trend-down"
+def render_html_cards(details):
+    # 三张卡片拼成一段 HTML，只调用一次 st.markdown
+    cards = []
+    for data in details:
+        if not data:
+            cards.append("<div></div>")  # 占位，保持网格位置
+            continue
+
+        cards.append(_CARD_TMPL.substitute(
+            symbol=data['symbol'],
+            price=f"{data['price']:,.2f}",
+            c_1h="trend-up" if data['change_1h'] >= 0 else "trend-down",
+            c_4h="trend-up" if data['change_4h'] >= 0 else "trend-down",
+            c_24h="trend-up" if data['change_24h'] >= 0 else "trend-down",
+            change_1h=f"{data['change_1h'] * 100:+.2f}",
+            change_4h=f"{data['change_4h'] * 100:+.2f}",
+            change_24h=f"{data['change_24h'] * 100:+.2f}",
+            oi_value=format_currency(data['oi_value']),
+        ))
+    html_code = '<div class="metric-grid">' + "".join(cards) + "</div>"
+    st.markdown(html_code, unsafe_allow_html=True)
 
-    # 构建 HTML 卡片
-    # 【关键修改】使用 textwrap.dedent 去除多行字符串前的缩进空格
-    html_code = textwrap.dedent(f"""
-        <div class="metric-card">
-            <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 10px;">
-                <div style="font-size: 1.2rem; font-weight: bold; color: #EAECEF;">{data['symbol']} <span style="font-size: 0.8rem; color: #848E9C; background: #2B3139; padding: 2px 6px; border-radius: 4px;">PERP</span></div>
-                <div class="metric-value">${data['price']:,.2f}</div>
-            </div>
 
-            <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 5px; margin-bottom: 15px;">
-                <div><div class="metric-label">1H</div><div class="{c_1h}">{data['change_1h'] * 100:+.2f}%</div></div>
-                <div><div class="metric-label">4H</div><div class="{c_4h}">{data['change_4h'] * 100:+.2f}%</div></div>
-                <div style="text-align: right;"><div class="metric-label">24H</div><div class="{c_24h}">{data['change_24h'] * 100:+.2f}%</div></div>
-            </div>
+@st.fragment
+def render_ticker_table(df, fetched_at):
+    # 独立 fragment：搜索/勾选只重跑表格部分，不重新执行整个 main()
+    # 在过滤/截断之前计算，进度条刻度保持全市场一致；
+    # 以抓取时间为键存入 session_state，搜索输入触发的 rerun 不再重复计算，数据更新后自动失效
+    cached = st.session_state.get('vol_max')
+    if cached is None or cached[0] != fetched_at:
+        cached = st.session_state['vol_max'] = (fetched_at, df['Volume (USDT)'].max())
+    vol_max = cached[1]
+
+    col_search, col_all, _ = st.columns([2, 1, 3])
+    with col_search:
+        search_term = st.text_input("🔍 搜索 Token", "", placeholder="BTC, ETH...").upper()
+    with col_all:
+        st.write("")
+        show_all = st.checkbox("显示全部", value=False, help=f"默认仅显示成交量前 {TABLE_TOP_N}")
+
+    # 先过滤再排序；按字面子串匹配，不走正则
+    if search_term:
+        mask = df['Symbol'].str.contains(search_term, regex=False, na=False)
+        df = df[mask]
+
+    # 直接对底层数组 argsort，按成交量降序 (stable 保证同值顺序不变)
+    order = np.argsort(-df['Volume (USDT)'].to_numpy(), kind='stable')
+    df = df.take(order).reset_index(drop=True)
+    if not show_all:
+        df = df.head(TABLE_TOP_N)
+
+    column_config = {
+        "Symbol": st.column_config.TextColumn("Token", help="交易对名称"),
+        "Price": st.column_config.NumberColumn("Price", format="$%.4f"),
+        "Change 1h": st.column_config.NumberColumn("1h %", format="%+.2f%%"),
+        "Change 4h": st.column_config.NumberColumn("4h %", format="%+.2f%%"),
+        "Change 24h": st.column_config.NumberColumn("24h %", format="%+.2f%%"),
+        "High 24h": st.column_config.NumberColumn("High (24h)", format="$%.4f"),
+        "Low 24h": st.column_config.NumberColumn("Low (24h)", format="$%.4f"),
+        "Volume (USDT)": st.column_config.ProgressColumn(
+            "Volume (24h)", format="$%f", min_value=0, max_value=vol_max,
+        ),
+        "FullSymbol": None
+    }
 
-            <div style="border-top: 1px solid #2B3139; padding-top: 10px;">
-                <div style="display: flex; justify-content: space-between;">
-                    <span class="metric-label">Open Interest</span>
-                    <span style="color: #EAECEF; font-weight: 500;">{format_currency(data['oi_value'])}</span>
-                </div>
-                <div style="margin-top: 5px; height: 6px; background: #2B3139; border-radius: 3px; overflow: hidden;">
-                    <div style="width: 70%; height: 100%; background: linear-gradient(90deg, #0ECB81 0%, #25a69a 100%);"></div>
-                </div>
-            </div>
-        </div>
-    """)
-    st.markdown(html_code, unsafe_allow_html=True)
+    # 不使用 Styler：直接传 DataFrame 走 Arrow 序列化，涨跌方向由 +/- 号体现
+    st.dataframe(
+        df,
+        column_config=column_config,
+        use_container_width=True,
+        height=800,
+        hide_index=True
+    )
 
 
 # ==========================================
@@ -194,67 +303,43 @@ def render_html_card(data):
 # ==========================================
 
 def main():
+    df, fetched_at = get_all_tickers()
+
     col_title, col_btn = st.columns([6, 1])
     with col_title:
         st.title("Bitget Token 实时看板")
-        st.caption(f"Last Updated: {datetime.now().strftime('%H:%M:%S')} (UTC)")
+        st.caption(f"Last Updated: {fetched_at} (UTC)")
     with col_btn:
         # 这个按钮现在会自动应用 config.toml 里的 primaryColor (绿色)
         if st.button("🔄 刷新数据", use_container_width=True):
             st.cache_data.clear()
+            st.session_state.pop('vol_max', None)
             st.rerun()
 
     # --- 第一部分：核心资产卡片 ---
     st.subheader("🔥 核心资产 & 持仓分析 (Open Interest)")
     majors = ["BTC", "ETH", "SOL"]
-    cols = st.columns(3)
-    for i, symbol in enumerate(majors):
-        with cols[i]:
-            detail_data = get_coin_details(symbol)
-            render_html_card(detail_data)
+    client = get_client()
+    ticker_rows = df.set_index('FullSymbol') if not df.empty else pd.DataFrame()
+
+    def fetch_details(symbol):
+        usdt_symbol = f"{symbol}USDT"
+        row = ticker_rows.loc[usdt_symbol] if usdt_symbol in ticker_rows.index else None
+        return get_coin_details(symbol, row, client)
+
+    # 三个币种的请求互不依赖，并发发出
+    with ThreadPoolExecutor(max_workers=len(majors)) as executor:
+        details = list(executor.map(fetch_details, majors))
+
+    render_html_cards(details)
 
     st.markdown("---")
 
     # --- 第二部分：所有代币表格 ---
     st.subheader("📊 现货行情概览")
-    df = get_all_tickers()
 
     if not df.empty:
-        col_search, _ = st.columns([1, 2])
-        with col_search:
-            search_term = st.text_input("🔍 搜索 Token", "", placeholder="BTC, ETH...").upper()
-
-        if search_term:
-            df = df[df['Symbol'].str.contains(search_term)]
-
-        df = df.sort_values(by="Volume (USDT)", ascending=False).reset_index(drop=True)
-
-        column_config = {
-            "Symbol": st.column_config.TextColumn("Token", help="交易对名称"),
-            "Price": st.column_config.NumberColumn("Price", format="$%.4f"),
-            "Change 1h": st.column_config.NumberColumn("1h %", format="%.2f%%"),
-            "Change 4h": st.column_config.NumberColumn("4h %", format="%.2f%%"),
-            "Change 24h": st.column_config.NumberColumn("24h %", format="%.2f%%"),
-            "High 24h": st.column_config.NumberColumn("High (24h)", format="$%.4f"),
-            "Low 24h": st.column_config.NumberColumn("Low (24h)", format="$%.4f"),
-            "Volume (USDT)": st.column_config.ProgressColumn(
-                "Volume (24h)", format="$%f", min_value=0, max_value=df['Volume (USDT)'].max(),
-            ),
-            "FullSymbol": None
-        }
-
-        def color_change(val):
-            return f'color: {"#0ECB81" if val >= 0 else "#F6465D"}'
-
-        styled_df = df.style.applymap(color_change, subset=['Change 1h', 'Change 4h', 'Change 24h'])
-
-        st.dataframe(
-            styled_df,
-            column_config=column_config,
-            use_container_width=True,
-            height=800,
-            hide_index=True
-        )
+        render_ticker_table(df, fetched_at)
     else:
         st.error("无法加载市场数据，请检查网络连接。")
 